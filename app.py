@@ -1,16 +1,30 @@
 import os
+import shutil
+import wave
+from collections import deque
 import streamlit as st
 from datetime import datetime
 import yt_dlp
 
 # Import your backend functions
 from translate_media import (
-    extract_audio_from_video,
-    merge_audio_with_video_simple,
+    OUTPUT_DIR,
+    PIPER_VOICE,
+    WHISPER_DECODE_OPTIONS,
+    load_marian_model,
+    load_piper_voice,
+    load_whisper_model,
+    load_cached_tts,
+    store_cached_tts,
+    translate_sentences,
+    warm_up_models,
+    dub_video,
+    extract_audio_array,
 )
 
-output_dir = "translated_output"
+output_dir = OUTPUT_DIR
 os.makedirs(output_dir, exist_ok=True)
+history_file = os.path.join(output_dir, "history.txt")
 
 st.set_page_config(page_title="English to Hindi Audio/Video Translator", layout="centered")
 st.title("🎙 English to Hindi Audio/Video Translator")
@@ -18,40 +32,97 @@ st.warning("⚠️ On Streamlit Cloud, use very short audio/video clips (less th
 
 st.write("Upload an English audio/video file or paste a YouTube link to get a Hindi dubbed version!")
 
+# --- Cached model loaders (kept warm across Streamlit reruns) ---
+@st.cache_resource
+def _get_whisper(size):
+    return load_whisper_model(size)
+
+# Loaded from warm_up_models' background thread, which has no ScriptRunContext for a spinner
+@st.cache_resource(show_spinner=False)
+def _get_marian():
+    return load_marian_model()
+
+@st.cache_resource(show_spinner=False)
+def _get_piper_voice(voice_name):
+    return load_piper_voice(voice_name)
+
+# One line-buffered append handle shared by every rerun/session
+@st.cache_resource
+def _get_history_writer():
+    return open(history_file, "a", encoding="utf-8", buffering=1)
+
 # --- Helper functions with error handling ---
-def transcribe_audio(audio_path):
-    import whisper
+def transcribe_audio(audio):
     try:
-        model = whisper.load_model("tiny")  # Use "tiny" for cloud
-        result = model.transcribe(audio_path, language="en")
-        return result["text"].strip()
+        model = _get_whisper("tiny.en")  # Use "tiny.en" for cloud
+        segments, _ = model.transcribe(audio, **WHISPER_DECODE_OPTIONS)
+        return " ".join(segment.text for segment in segments).strip()
     except Exception as e:
         st.error(f"Transcription failed: {e}")
         return None
 
-def translate_text(english_text):
+def translate_text(english_text, marian_future):
     try:
-        from transformers import MarianMTModel, MarianTokenizer
-        model_name = 'Helsinki-NLP/opus-mt-en-hi'
-        tokenizer = MarianTokenizer.from_pretrained(model_name)
-        model = MarianMTModel.from_pretrained(model_name)
-        inputs = tokenizer(english_text, return_tensors="pt", padding=True, truncation=True, max_length=512)
-        translated = model.generate(**inputs)
-        return tokenizer.decode(translated[0], skip_special_tokens=True)
+        tokenizer, translator = marian_future.result()
+        return translate_sentences(english_text, tokenizer, translator)
     except Exception as e:
         st.error(f"Translation failed: {e}")
         return None
 
-def text_to_speech_gtts(hindi_text, output_audio_path):
+def text_to_speech(hindi_text, output_audio_path, voice_future):
     try:
-        from gtts import gTTS
-        tts = gTTS(text=hindi_text, lang='hi')
-        tts.save(output_audio_path)
+        if load_cached_tts(hindi_text, PIPER_VOICE, output_audio_path):
+            return True
+        voice = voice_future.result()
+        with wave.open(output_audio_path, "wb") as wav_file:
+            voice.synthesize_wav(hindi_text, wav_file)
+        store_cached_tts(hindi_text, PIPER_VOICE, output_audio_path)
         return True
     except Exception as e:
         st.error(f"TTS failed: {e}")
         return False
 
+def process_file(input_path, base_name, is_video, source_label):
+    output_video_path = os.path.join(output_dir, f"{base_name}_hindi.mp4") if is_video else None
+    output_audio_path = os.path.join(output_dir, f"{base_name}_hindi.wav")
+
+    with st.spinner("Processing..."):
+        marian_future, voice_future = warm_up_models(_get_marian, _get_piper_voice)
+
+        # Step 1: Decode audio in memory
+        audio = extract_audio_array(input_path)
+
+        # Step 2: Transcribe
+        english_text = transcribe_audio(audio) if audio is not None else None
+        st.write("*Transcription:*", english_text if english_text else "None")
+
+        # Step 3: Translate
+        hindi_text = translate_text(english_text, marian_future) if english_text else None
+        st.write("*Translation:*", hindi_text if hindi_text else "None")
+
+        # Step 4: TTS
+        tts_success = text_to_speech(hindi_text, output_audio_path, voice_future) if hindi_text else False
+
+        # Show and offer download for Hindi audio
+        if tts_success and os.path.exists(output_audio_path):
+            st.audio(output_audio_path, format="audio/wav")
+            with open(output_audio_path, "rb") as f:
+                st.download_button("Download Hindi Audio", f, file_name=f"{base_name}_hindi.wav")
+        else:
+            st.warning("Hindi audio file not found!")
+
+        # Step 5: Merge with video if needed (and only if there is dubbed audio to merge)
+        if is_video and tts_success:
+            if dub_video(input_path, output_audio_path, output_video_path) and os.path.exists(output_video_path):
+                st.video(output_video_path)
+                with open(output_video_path, "rb") as f:
+                    st.download_button("Download Dubbed Video", f, file_name=f"{base_name}_hindi.mp4")
+            else:
+                st.warning("Dubbed video file not found!")
+
+        # Save history
+        _get_history_writer().write(f"{datetime.now()} | {source_label} | {base_name}\n")
+
 # --- YouTube Link Section ---
 st.subheader("Paste a YouTube link")
 youtube_url = st.text_input("YouTube Video URL")
@@ -63,6 +134,7 @@ if st.button("Download from YouTube") and youtube_url:
             'outtmpl': os.path.join(output_dir, '%(title)s.%(ext)s'),
             'noplaylist': True,
             'quiet': True,
+            'buffersize': 1 << 20,
         }
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             info = ydl.extract_info(youtube_url, download=True)
@@ -92,113 +164,18 @@ if 'yt_downloaded_file' in st.session_state:
         st.audio(downloaded_file)
 
     if st.button("Translate! (YouTube)"):
-        def process_file(input_path, base_name, is_video, is_audio, source_label):
-            if is_video and os.path.exists(input_path):
-                st.video(input_path)
-            elif is_audio and os.path.exists(input_path):
-                st.audio(input_path)
-
-            output_video_path = os.path.join(output_dir, f"{base_name}_hindi.mp4") if is_video else None
-            output_audio_path = os.path.join(output_dir, f"{base_name}_hindi.wav")
-
-            with st.spinner("Processing..."):
-                # Step 1: Extract audio if video
-                if is_video:
-                    temp_audio_path = os.path.join(output_dir, f"{base_name}_temp_audio.wav")
-                    extract_audio_from_video(input_path, temp_audio_path)
-                    audio_to_process = temp_audio_path
-                else:
-                    audio_to_process = input_path
-
-                # Step 2: Transcribe
-                english_text = transcribe_audio(audio_to_process)
-                st.write("*Transcription:*", english_text if english_text else "None")
-
-                # Step 3: Translate
-                hindi_text = translate_text(english_text) if english_text else None
-                st.write("*Translation:*", hindi_text if hindi_text else "None")
-
-                # Step 4: TTS
-                tts_success = text_to_speech_gtts(hindi_text, output_audio_path) if hindi_text else False
-
-                # Show and offer download for Hindi audio
-                if tts_success and os.path.exists(output_audio_path):
-                    st.audio(output_audio_path, format="audio/wav")
-                    with open(output_audio_path, "rb") as f:
-                        st.download_button("Download Hindi Audio", f, file_name=f"{base_name}_hindi.wav")
-                else:
-                    st.warning("Hindi audio file not found!")
-
-                # Step 5: Merge with video if needed
-                if is_video:
-                    merge_audio_with_video_simple(input_path, output_audio_path, output_video_path)
-                    if os.path.exists(output_video_path):
-                        st.video(output_video_path)
-                        with open(output_video_path, "rb") as f:
-                            st.download_button("Download Dubbed Video", f, file_name=f"{base_name}_hindi.mp4")
-                    else:
-                        st.warning("Dubbed video file not found!")
-
-                # Save history
-                with open(os.path.join(output_dir, "history.txt"), "a", encoding="utf-8") as hist:
-                    hist.write(f"{datetime.now()} | {source_label} | {base_name}\n")
-
-        process_file(downloaded_file, base_name, is_video, is_audio, "YouTube")
+        process_file(downloaded_file, base_name, is_video, "YouTube")
         del st.session_state['yt_downloaded_file']
 
 # --- File Upload Section ---
 st.subheader("Or upload an audio/video file")
 uploaded_file = st.file_uploader("Upload Audio/Video", type=["mp3", "wav", "mp4", "avi", "mov", "mkv", "wmv", "flv", "m4a", "aac", "flac"])
 
-def process_file(input_path, base_name, is_video, is_audio, source_label):
-    if is_video and os.path.exists(input_path):
-        st.video(input_path)
-    elif is_audio and os.path.exists(input_path):
-        st.audio(input_path)
-
-    output_video_path = os.path.join(output_dir, f"{base_name}_hindi.mp4") if is_video else None
-    output_audio_path = os.path.join(output_dir, f"{base_name}_hindi.wav")
-
-    if st.button(f"Translate! ({source_label})", key=f"translate_{base_name}_{source_label}"):
-        with st.spinner("Processing..."):
-            if is_video:
-                temp_audio_path = os.path.join(output_dir, f"{base_name}_temp_audio.wav")
-                extract_audio_from_video(input_path, temp_audio_path)
-                audio_to_process = temp_audio_path
-            else:
-                audio_to_process = input_path
-
-            english_text = transcribe_audio(audio_to_process)
-            st.write("*Transcription:*", english_text if english_text else "None")
-
-            hindi_text = translate_text(english_text) if english_text else None
-            st.write("*Translation:*", hindi_text if hindi_text else "None")
-
-            tts_success = text_to_speech_gtts(hindi_text, output_audio_path) if hindi_text else False
-
-            if tts_success and os.path.exists(output_audio_path):
-                st.audio(output_audio_path, format="audio/wav")
-                with open(output_audio_path, "rb") as f:
-                    st.download_button("Download Hindi Audio", f, file_name=f"{base_name}_hindi.wav")
-            else:
-                st.warning("Hindi audio file not found!")
-
-            if is_video:
-                merge_audio_with_video_simple(input_path, output_audio_path, output_video_path)
-                if os.path.exists(output_video_path):
-                    st.video(output_video_path)
-                    with open(output_video_path, "rb") as f:
-                        st.download_button("Download Dubbed Video", f, file_name=f"{base_name}_hindi.mp4")
-                else:
-                    st.warning("Dubbed video file not found!")
-
-            with open(os.path.join(output_dir, "history.txt"), "a", encoding="utf-8") as hist:
-                hist.write(f"{datetime.now()} | {source_label} | {base_name}\n")
-
 if uploaded_file:
     input_path = os.path.join(output_dir, uploaded_file.name)
+    uploaded_file.seek(0)  # the same UploadedFile is reused across reruns
     with open(input_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
+        shutil.copyfileobj(uploaded_file, f, length=1 << 20)
     st.success(f"Uploaded: {uploaded_file.name}")
 
     file_ext = os.path.splitext(input_path)[1].lower()
@@ -206,14 +183,20 @@ if uploaded_file:
     is_audio = file_ext in ['.mp3', '.wav', '.m4a', '.aac', '.flac']
     base_name = os.path.splitext(os.path.basename(input_path))[0]
 
-    process_file(input_path, base_name, is_video, is_audio, "Upload")
+    if is_video:
+        st.video(input_path)
+    elif is_audio:
+        st.audio(input_path)
+
+    if st.button("Translate! (Upload)", key=f"translate_{base_name}_Upload"):
+        process_file(input_path, base_name, is_video, "Upload")
 
 # --- History Section ---
 st.subheader("History")
-history_file = os.path.join(output_dir, "history.txt")
 if os.path.exists(history_file):
     with open(history_file, "r", encoding="utf-8") as hist:
-        for line in hist.readlines()[-10:][::-1]:  # Show last 10
-            st.write(line.strip())
+        tail = deque(hist, maxlen=10)  # Show last 10
+    for line in reversed(tail):
+        st.write(line.strip())
 else:
     st.write("No history yet.")
\ No newline at end of file
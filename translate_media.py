@@ -1,96 +1,318 @@
 import os
 import re
-import whisper
-from transformers import MarianMTModel, MarianTokenizer
-from gtts import gTTS
+import concurrent.futures
+import functools
+import hashlib
+import shutil
+import tempfile
+import threading
+import urllib.request
+import wave
+import ctranslate2
+import numpy as np
+import soundfile as sf
+from ctranslate2.converters import TransformersConverter
+from faster_whisper import WhisperModel
+from transformers import MarianTokenizer
+from piper.voice import PiperVoice
 import subprocess
 
-def extract_audio_from_video(video_path, audio_path):
+MODELS_DIR = "models"
+OUTPUT_DIR = "translated_output"
+# FP16 on GPU when one is visible to CTranslate2, INT8 otherwise (see _load_on_device)
+DEVICE = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+COMPUTE_TYPE = "float16" if DEVICE == "cuda" else "int8"
+# Tried in order when the GPU rejects COMPUTE_TYPE (older cards lack FP16 support)
+_CUDA_FALLBACK_COMPUTE_TYPES = ("int8_float32", "float32")
+# One inference call at a time, using every core for its intra-op work
+CPU_THREADS = max(1, os.cpu_count() or 1)
+MARIAN_MODEL_NAME = 'Helsinki-NLP/opus-mt-en-hi'
+# Unquantized CTranslate2 conversion of MARIAN_MODEL_NAME, created on first use;
+# compute_type quantizes it at load time
+MARIAN_CT2_DIR = os.path.join(MODELS_DIR, "opus-mt-en-hi-ct2-fp32")
+PIPER_VOICE = "hi_IN-priyamvada-medium"
+PIPER_VOICES_URL = "https://huggingface.co/rhasspy/piper-voices/resolve/main"
+# Greedy, context-free decoding; much faster than beam search on short clips
+WHISPER_DECODE_OPTIONS = {
+    'beam_size': 1,
+    'best_of': 1,
+    'temperature': 0.0,
+    'condition_on_previous_text': False,
+    'without_timestamps': True,
+}
+_WHITESPACE_RE = re.compile(r'\s+')
+_SPACE_BEFORE_PUNCT_RE = re.compile(r' ([.,])')
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+MARIAN_BATCH_TOKEN_BUDGET = 128
+# ffmpeg only writes actual errors to stderr, so the captured buffer stays tiny
+FFMPEG_QUIET_FLAGS = ('-hide_banner', '-nostats', '-loglevel', 'error')
+TTS_CACHE_DIR = os.path.join(OUTPUT_DIR, "tts_cache")
+TTS_CACHE_MAX_ENTRIES = 64
+
+# A visible GPU is no guarantee the CUDA runtime libraries (cuBLAS, cuDNN) are installed, and
+# CTranslate2 only loads them on the first computation, so each CUDA model must pass smoke_test
+def _load_on_device(load, smoke_test):
+    if DEVICE == "cuda":
+        for compute_type in (COMPUTE_TYPE, *_CUDA_FALLBACK_COMPUTE_TYPES):
+            try:
+                model = load("cuda", compute_type)
+                smoke_test(model)
+                return model
+            except ValueError as e:  # compute type not supported by this GPU
+                print(f"Warning: CUDA does not support {compute_type}: {e}")
+            except (RuntimeError, OSError) as e:
+                print(f"Warning: Could not run model on CUDA: {e}")
+                break
+        print("Falling back to CPU")
+    return load("cpu", "int8")
+
+def _whisper_smoke_test(model):
+    segments, _ = model.transcribe(np.zeros(16000, dtype=np.float32), **WHISPER_DECODE_OPTIONS)
+    list(segments)
+
+def load_whisper_model(size):
+    return _load_on_device(lambda device, compute_type: WhisperModel(
+        size, device=device, compute_type=compute_type, cpu_threads=CPU_THREADS, num_workers=1
+    ), _whisper_smoke_test)
+
+@functools.lru_cache(maxsize=1)
+def _get_whisper(size):
+    print("Loading Whisper model...")
+    return load_whisper_model(size)
+
+# Converts into a sibling directory and swaps it in, so an interrupted run never leaves a half-written model
+def convert_marian_model():
+    if os.path.exists(os.path.join(MARIAN_CT2_DIR, "model.bin")):
+        return
+    print(f"Converting {MARIAN_MODEL_NAME} to CTranslate2 (one-time)...")
+    tmp_dir = f"{MARIAN_CT2_DIR}.tmp"
+    TransformersConverter(MARIAN_MODEL_NAME).convert(tmp_dir, force=True)
+    shutil.rmtree(MARIAN_CT2_DIR, ignore_errors=True)
+    os.replace(tmp_dir, MARIAN_CT2_DIR)
+
+def load_marian_model():
+    convert_marian_model()
+    tokenizer = MarianTokenizer.from_pretrained(MARIAN_MODEL_NAME)
+    translator = _load_on_device(lambda device, compute_type: ctranslate2.Translator(
+        MARIAN_CT2_DIR, device=device, compute_type=compute_type, inter_threads=1, intra_threads=CPU_THREADS
+    ), lambda translator: translator.translate_batch([["▁a", "</s>"]], max_decoding_length=2))
+    return tokenizer, translator
+
+@functools.lru_cache(maxsize=1)
+def _get_marian():
+    print("Loading translation model...")
+    return load_marian_model()
+
+# Piper voices ship as <name>.onnx plus <name>.onnx.json from rhasspy/piper-voices
+def download_piper_voice(voice_name):
+    os.makedirs(MODELS_DIR, exist_ok=True)
+    lang_region, speaker, quality = voice_name.split("-")
+    voice_url = f"{PIPER_VOICES_URL}/{lang_region.split('_')[0]}/{lang_region}/{speaker}/{quality}"
+    model_path = os.path.join(MODELS_DIR, f"{voice_name}.onnx")
+    for path in (model_path, f"{model_path}.json"):
+        if not os.path.exists(path):
+            print(f"Downloading {os.path.basename(path)}...")
+            # Download beside the target so a truncated transfer is retried next time
+            urllib.request.urlretrieve(f"{voice_url}/{os.path.basename(path)}", f"{path}.part")
+            os.replace(f"{path}.part", path)
+    return model_path
+
+def load_piper_voice(voice_name):
+    return PiperVoice.load(download_piper_voice(voice_name))
+
+@functools.lru_cache(maxsize=1)
+def _get_piper_voice(voice_name):
+    print("Loading TTS voice...")
+    return load_piper_voice(voice_name)
+
+# Daemon thread, so an early exit never waits on a half-finished download or conversion
+def _run_in_background(fn, *args):
+    future = concurrent.futures.Future()
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+# Loads the translation model and TTS voice in the background so they overlap transcription
+def warm_up_models(get_marian=_get_marian, get_voice=_get_piper_voice):
+    return _run_in_background(get_marian), _run_in_background(get_voice, PIPER_VOICE)
+
+def _tts_cache_path(hindi_text, voice_name):
+    key = hashlib.sha1(f"{hindi_text}|{voice_name}".encode("utf-8")).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, f"{key}.wav")
+
+def load_cached_tts(hindi_text, voice_name, output_audio_path):
+    cached_path = _tts_cache_path(hindi_text, voice_name)
+    try:
+        shutil.copy(cached_path, output_audio_path)
+        os.utime(cached_path)  # mark as recently used for eviction
+    except FileNotFoundError:  # never cached, or evicted by another session
+        return False
+    return True
+
+# Best-effort: the cache is shared across sessions, so a failure here never fails the synthesis
+def store_cached_tts(hindi_text, voice_name, output_audio_path):
+    tmp_path = None
+    try:
+        os.makedirs(TTS_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=TTS_CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        shutil.copy(output_audio_path, tmp_path)
+        os.replace(tmp_path, _tts_cache_path(hindi_text, voice_name))
+        tmp_path = None
+        _evict_tts_cache()
+    except OSError as e:
+        print(f"Warning: Could not cache speech: {e}")
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _evict_tts_cache():
+    entries = []
+    for entry in os.scandir(TTS_CACHE_DIR):
+        if not entry.name.endswith(".wav"):
+            continue
+        try:
+            entries.append((entry.stat().st_mtime, entry.path))
+        except FileNotFoundError:
+            continue
+    for _, path in sorted(entries)[:-TTS_CACHE_MAX_ENTRIES]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+
+# Decodes straight to 16 kHz mono float32 in memory, the format Whisper expects
+def extract_audio_array(media_path):
+    if media_path.lower().endswith('.wav'):
+        try:
+            info = sf.info(media_path)
+            if info.samplerate == 16000 and info.channels == 1:
+                audio, _ = sf.read(media_path, dtype='float32')
+                print(f"✓ Audio loaded: {len(audio) / 16000:.1f}s")
+                return audio
+        except RuntimeError as e:
+            print(f"Warning: Could not read WAV directly, falling back to ffmpeg: {e}")
     try:
         cmd = [
-            'ffmpeg', '-i', video_path, 
-            '-vn', '-acodec', 'pcm_s16le', 
-            '-ar', '16000', '-ac', '1', 
-            audio_path, '-y'
+            'ffmpeg', *FFMPEG_QUIET_FLAGS, '-i', media_path,
+            '-vn', '-f', 's16le', '-acodec', 'pcm_s16le',
+            '-ar', '16000', '-ac', '1',
+            '-'
         ]
-        subprocess.run(cmd, check=True, capture_output=True)
-        print(f"✓ Audio extracted to: {audio_path}")
-        return True
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        audio = np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+        print(f"✓ Audio extracted: {len(audio) / 16000:.1f}s")
+        return audio
     except subprocess.CalledProcessError as e:
-        print(f"✗ Error extracting audio: {e}")
-        return False
+        print(f"✗ Error extracting audio: {e}\n{e.stderr.decode(errors='replace')}")
+        return None
 
-def transcribe_audio(audio_path):
+def transcribe_audio(audio):
     try:
-        print("Loading Whisper model...")
-        model = whisper.load_model("base")
+        model = _get_whisper("base.en")
         print("Transcribing audio...")
-        result = model.transcribe(audio_path, language="en", task="transcribe", verbose=True)
-        english_text = result["text"].strip()
-        english_text = re.sub(r'\s+', ' ', english_text)
-        english_text = english_text.replace(' .', '.').replace(' ,', ',')
+        segments, _ = model.transcribe(audio, task="transcribe", **WHISPER_DECODE_OPTIONS)
+        english_text = " ".join(segment.text for segment in segments).strip()
+        english_text = _WHITESPACE_RE.sub(' ', english_text)
+        english_text = _SPACE_BEFORE_PUNCT_RE.sub(r'\1', english_text)
         print(f"✓ Transcription: {english_text}")
         return english_text
     except Exception as e:
         print(f"✗ Error transcribing: {e}")
         return None
 
-def translate_text(english_text):
+# Splits into sentences and lets CTranslate2 pack them into token-budgeted batches, so no
+# single sequence covers the whole transcript; raises on failure, see translate_text
+def translate_sentences(english_text, tokenizer, translator):
+    sentences = _SENTENCE_SPLIT_RE.split(english_text.strip())
+    sentences = [s.strip() for s in sentences if len(s.strip()) >= 3]
+    if not sentences:
+        return None
+    batch_tokens = [
+        tokenizer.convert_ids_to_tokens(tokenizer.encode(sentence, truncation=True, max_length=512))
+        for sentence in sentences
+    ]
+    results = translator.translate_batch(
+        batch_tokens, beam_size=1, max_batch_size=MARIAN_BATCH_TOKEN_BUDGET, batch_type="tokens"
+    )
+    translated_sentences = [
+        tokenizer.decode(tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True)
+        for result in results
+    ]
+    return ' '.join(translated_sentences)
+
+def translate_text(english_text, marian_future=None):
     try:
-        print("Loading translation model...")
-        model_name = 'Helsinki-NLP/opus-mt-en-hi'
-        tokenizer = MarianTokenizer.from_pretrained(model_name)
-        model = MarianMTModel.from_pretrained(model_name)
+        tokenizer, translator = marian_future.result() if marian_future else _get_marian()
         print("Translating text...")
-        english_text = english_text.strip()
-        if not english_text:
+        hindi_text = translate_sentences(english_text, tokenizer, translator)
+        if not hindi_text:
             return None
-        sentences = re.split(r'[.!?]+', english_text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        translated_sentences = []
-        for sentence in sentences:
-            if len(sentence) < 3:
-                continue
-            try:
-                inputs = tokenizer(sentence, return_tensors="pt", padding=True, truncation=True, max_length=512)
-                translated = model.generate(**inputs)
-                translated_sentence = tokenizer.decode(translated[0], skip_special_tokens=True)
-                translated_sentences.append(translated_sentence)
-            except Exception as e:
-                print(f"Warning: Could not translate sentence: {sentence}")
-                continue
-        hindi_text = ' '.join(translated_sentences)
         print(f"✓ Translation: {hindi_text}")
         return hindi_text
     except Exception as e:
         print(f"✗ Error translating: {e}")
         return None
 
-def text_to_speech_gtts(hindi_text, output_audio_path):
+def text_to_speech(hindi_text, output_audio_path, voice_future=None):
     try:
-        print("Generating Hindi speech using gTTS (Google Text-to-Speech)...")
-        tts = gTTS(text=hindi_text, lang='hi')
-        tts.save(output_audio_path)
+        if load_cached_tts(hindi_text, PIPER_VOICE, output_audio_path):
+            print(f"✓ Speech loaded from cache: {output_audio_path}")
+            return True
+        voice = voice_future.result() if voice_future else _get_piper_voice(PIPER_VOICE)
+        print("Generating Hindi speech using Piper...")
+        with wave.open(output_audio_path, "wb") as wav_file:
+            voice.synthesize_wav(hindi_text, wav_file)
+        store_cached_tts(hindi_text, PIPER_VOICE, output_audio_path)
         print(f"✓ Speech generated: {output_audio_path}")
         return True
     except Exception as e:
-        print(f"✗ Error in gTTS: {e}")
+        print(f"✗ Error in TTS: {e}")
+        return False
+
+def encode_audio_aac(wav_path, aac_path):
+    try:
+        cmd = [
+            'ffmpeg', *FFMPEG_QUIET_FLAGS, '-i', wav_path,
+            '-c:a', 'aac', '-b:a', '96k',
+            aac_path, '-y'
+        ]
+        subprocess.run(cmd, check=True, stderr=subprocess.PIPE)
+        print(f"✓ Audio encoded: {aac_path}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"✗ Error encoding audio: {e}\n{e.stderr.decode(errors='replace')}")
         return False
 
+# Expects AAC audio (see encode_audio_aac) so both streams are copied without re-encoding
 def merge_audio_with_video_simple(video_path, audio_path, output_video_path):
     try:
         cmd = [
-            'ffmpeg', '-i', video_path, '-i', audio_path,
-            '-c:v', 'copy', '-map', '0:v:0', '-map', '1:a:0',
-            '-shortest', output_video_path, '-y'
+            'ffmpeg', *FFMPEG_QUIET_FLAGS, '-i', video_path, '-i', audio_path,
+            '-c:v', 'copy', '-c:a', 'copy', '-map', '0:v:0', '-map', '1:a:0',
+            '-shortest', '-movflags', '+faststart', output_video_path, '-y'
         ]
-        subprocess.run(cmd, check=True)
+        subprocess.run(cmd, check=True, stderr=subprocess.PIPE)
         print(f"✓ Video created: {output_video_path}")
         return True
     except subprocess.CalledProcessError as e:
-        print(f"✗ Error creating video: {e}")
+        print(f"✗ Error creating video: {e}\n{e.stderr.decode(errors='replace')}")
         return False
 
+# Encodes the dubbed WAV to an intermediate .m4a beside it, muxes it in, and always removes the .m4a
+def dub_video(video_path, wav_path, output_video_path):
+    aac_path = f"{os.path.splitext(wav_path)[0]}.m4a"
+    try:
+        return (encode_audio_aac(wav_path, aac_path)
+                and merge_audio_with_video_simple(video_path, aac_path, output_video_path))
+    finally:
+        if os.path.exists(aac_path):
+            os.remove(aac_path)
+
 def main():
     print("=== English to Hindi Audio/Video Translator (Improved) ===")
     print("This tool translates English audio/video to Hindi\n")
@@ -104,7 +326,7 @@ def main():
     if not (is_video or is_audio):
         print("✗ Unsupported file format!")
         return
-    output_dir = "translated_output"
+    output_dir = OUTPUT_DIR
     os.makedirs(output_dir, exist_ok=True)
     base_name = os.path.splitext(os.path.basename(input_path))[0]
     if is_video:
@@ -112,31 +334,26 @@ def main():
         output_audio_path = os.path.join(output_dir, f"{base_name}_hindi.wav")
     else:
         output_audio_path = os.path.join(output_dir, f"{base_name}_hindi.wav")
-    if is_video:
-        print(f"\nStep 1: Extracting audio from video...")
-        temp_audio_path = os.path.join(output_dir, "temp_audio.wav")
-        if not extract_audio_from_video(input_path, temp_audio_path):
-            return
-        audio_to_process = temp_audio_path
-    else:
-        audio_to_process = input_path
+    marian_future, voice_future = warm_up_models()
+    print(f"\nStep 1: Extracting audio...")
+    audio = extract_audio_array(input_path)
+    if audio is None:
+        return
     print(f"\nStep 2: Transcribing audio...")
-    english_text = transcribe_audio(audio_to_process)
+    english_text = transcribe_audio(audio)
     if not english_text:
         return
     print(f"\nStep 3: Translating to Hindi...")
-    hindi_text = translate_text(english_text)
+    hindi_text = translate_text(english_text, marian_future)
     if not hindi_text:
         return
     print(f"\nStep 4: Generating Hindi speech...")
-    if not text_to_speech_gtts(hindi_text, output_audio_path):
+    if not text_to_speech(hindi_text, output_audio_path, voice_future):
         return
     if is_video:
         print(f"\nStep 5: Creating dubbed video...")
-        if not merge_audio_with_video_simple(input_path, output_audio_path, output_video_path):
+        if not dub_video(input_path, output_audio_path, output_video_path):
             return
-    if is_video and os.path.exists(temp_audio_path):
-        os.remove(temp_audio_path)
     print(f"\n=== Translation Complete! ===")
     if is_video:
         print(f"✓ Dubbed video: {output_video_path}")